@@ -17,13 +17,25 @@ Or using the LeRobot CLI:
         --job_name=act_liquid_pouring \
         --batch_size=8 \
         --steps=50000
+
+Camera frames are decoded from video by LeRobot's video backend (torchcodec when
+installed, otherwise pyav), so decode speed depends on that backend rather than
+PIL. Install torchcodec in the training environment for the fastest decode;
+pillow-simd only helps datasets stored as individual image files.
 """
 
+import itertools
 import logging
+import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import torch
+from huggingface_hub.constants import SAFETENSORS_SINGLE_FILE
+from safetensors.torch import save_file
+from torch import nn
 
 from lerobot.configs.types import FeatureType
 from lerobot.datasets.lerobot_dataset import LeRobotDataset, LeRobotDatasetMetadata
@@ -53,11 +65,96 @@ def get_device() -> torch.device:
         return torch.device("cpu")
 
 
+def has_native_bf16(device: torch.device) -> bool:
+    """Check for hardware bf16 on CUDA (Ampere+), excluding emulated support."""
+    return device.type == "cuda" and torch.cuda.get_device_capability(device)[0] >= 8
+
+
+def get_amp_dtype(device: torch.device) -> torch.dtype:
+    """Pick the autocast dtype for the device (bf16 where supported, else fp16)."""
+    if device.type == "cuda":
+        return torch.bfloat16 if has_native_bf16(device) else torch.float16
+    if device.type == "mps":
+        return torch.float16
+    return torch.bfloat16
+
+
+class ImageNormalize(nn.Module):
+    """Scale uint8 images to [0, 1] and apply mean/std normalization on device."""
+
+    def __init__(self, mean, std, dtype: torch.dtype = torch.float32):
+        super().__init__()
+        self.dtype = dtype
+        self.register_buffer("mean", torch.as_tensor(mean, dtype=dtype))
+        # Same epsilon as LeRobot's normalizer
+        self.register_buffer("std", torch.as_tensor(std, dtype=dtype) + 1e-8)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return x.to(self.dtype).div_(255).sub_(self.mean).div_(self.std)
+
+
+def to_uint8(image: torch.Tensor) -> torch.Tensor:
+    """Requantize decoded [0, 1] frames to uint8 so workers ship 4x fewer bytes."""
+    return image.mul(255).round_().to(torch.uint8)
+
+
+def prepare_images(batch: dict, image_normalizers: dict[str, ImageNormalize]) -> dict:
+    """Convert uint8 images to NHWC (channels_last) layout and normalize them."""
+    for key, normalize in image_normalizers.items():
+        image = batch[key]
+        if image.ndim == 4:
+            image = image.contiguous(memory_format=torch.channels_last)
+        batch[key] = normalize(image)
+    return batch
+
+
+def save_checkpoint_async(
+    executor: ThreadPoolExecutor,
+    policy: ACTPolicy,
+    preprocessor,
+    postprocessor,
+    checkpoint_dir: Path,
+    master_weights: dict[str, torch.Tensor] | None = None,
+) -> Future:
+    """Snapshot policy weights to CPU and write them to disk on a background thread.
+
+    Produces the same layout as ``policy.save_pretrained``. Config and processors
+    are small and saved inline; only the weight serialization is deferred. When
+    the policy runs in bf16, ``master_weights`` supplies the fp32 values to save.
+    """
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    policy.config.save_pretrained(checkpoint_dir)
+    preprocessor.save_pretrained(checkpoint_dir)
+    postprocessor.save_pretrained(checkpoint_dir)
+
+    # Blocking copy so the snapshot is complete before the next optimizer step.
+    # Contiguous because safetensors rejects channels_last strides.
+    state_dict = policy.state_dict()
+    if master_weights is not None:
+        state_dict.update(master_weights)
+    state_dict = {
+        k: v.detach().to("cpu", memory_format=torch.contiguous_format, copy=True)
+        for k, v in state_dict.items()
+    }
+
+    def on_done(future: Future) -> None:
+        if future.exception() is not None:
+            logger.error(f"Failed to save checkpoint to {checkpoint_dir}: {future.exception()}")
+        else:
+            logger.info(f"Checkpoint saved to {checkpoint_dir}")
+
+    future = executor.submit(
+        save_file, state_dict, str(checkpoint_dir / SAFETENSORS_SINGLE_FILE), {"format": "pt"}
+    )
+    future.add_done_callback(on_done)
+    return future
+
+
 def make_delta_timestamps(delta_indices: list[int] | None, fps: int) -> list[float]:
     """Convert frame indices to timestamps based on FPS."""
     if delta_indices is None:
         return [0.0]
-    return [i / fps for i in delta_indices]
+    return (np.asarray(delta_indices, dtype=np.float64) / float(fps)).tolist()
 
 
 def main():
@@ -71,8 +168,20 @@ def main():
     # Training configuration
     training_steps = 50_000  # Total training steps
     batch_size = 8  # Batch size (8 is memory-efficient for 1080p images on M4 Pro)
+    grad_accum_steps = 4  # Micro-batches per optimizer step (effective batch = 32)
     log_freq = 100  # Log every N steps
     save_freq = 10_000  # Save checkpoint every N steps
+    use_amp = True  # Mixed-precision (autocast) for forward pass
+    bf16_weights = True  # bf16 model weights with fp32 master copy (CUDA bf16 + AMP only)
+    use_compile = True  # torch.compile the policy (CUDA/CPU only)
+    # Experimental: replay compiled graphs via CUDA Graphs (CUDA + compile, needs
+    # grad_accum_steps = 1). Gradient parity with eager is not yet verified.
+    use_cuda_graphs = False
+
+    # DataLoader configuration (override via env to profile decode throughput)
+    num_workers = int(os.environ.get("NUM_WORKERS", min(8, os.cpu_count() or 1)))
+    prefetch_factor = int(os.environ.get("PREFETCH_FACTOR", 4))  # Batches per worker
+    video_backend = os.environ.get("VIDEO_BACKEND")  # None lets LeRobot pick (torchcodec if installed)
 
     # ACT Policy configuration for liquid pouring
     chunk_size = 50  # Number of future actions to predict (adjusted for 30 FPS)
@@ -90,9 +199,22 @@ def main():
     # Setup
     # ==========================================================================
 
+    # Allocator settings must be in place before the first device allocation.
+    # Expandable segments reduce CUDA fragmentation from AMP/channels_last
+    # temporaries; the MPS watermark lifts the default memory cap.
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:256")
+    os.environ.setdefault("PYTORCH_MPS_HIGH_WATERMARK_RATIO", "0.0")
+
     # Select device
     device = get_device()
 
+    # Input shapes are static, so let cuDNN benchmark once and use TF32 on Ampere+
+    if device.type == "cuda":
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision("high")
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+
     logger.info(f"Loading dataset: {dataset_id}")
     logger.info(f"Output directory: {output_dir}")
 
@@ -121,6 +243,8 @@ def main():
     cfg = ACTConfig(
         input_features=input_features,
         output_features=output_features,
+        # Keep the preprocessor's device step on the same device as the policy
+        device=device.type,
         # Action chunking configuration
         chunk_size=chunk_size,
         n_action_steps=n_action_steps,
@@ -146,13 +270,63 @@ def main():
     policy = ACTPolicy(cfg)
     policy.train()
     policy.to(device)
+    policy.to(memory_format=torch.channels_last)  # NHWC conv kernels for ResNet18
+
+    # Run the model in bf16 and keep fp32 master weights for the optimizer: at
+    # lr=1e-5 most updates are below bf16 resolution and would be rounded away.
+    # Autocast is required to cast the fp32 state/action inputs for bf16 layers.
+    bf16_weights = bf16_weights and use_amp and has_native_bf16(device)
+    master_weights = None
+    if bf16_weights:
+        master_weights = {
+            k: v.detach().float().clone()
+            for k, v in policy.state_dict().items()
+            if v.is_floating_point()
+        }
+        policy.to(dtype=torch.bfloat16)
+
+    # Compile the policy in place (keeps save_pretrained/state_dict keys intact).
+    # Shapes are static, so specialize on them; MPS has limited inductor support.
+    # ACTPolicy.forward calls .item() for loss_dict, so a manual whole-step
+    # capture isn't possible; Inductor's CUDA Graph trees capture each compiled
+    # segment around those graph breaks instead. Gradients live in the graph
+    # memory pool and would be overwritten between accumulated micro-steps, so
+    # CUDA Graphs are only used without gradient accumulation.
+    use_compile = use_compile and device.type in ("cuda", "cpu")
+    if use_cuda_graphs and grad_accum_steps > 1:
+        logger.warning(
+            f"use_cuda_graphs requested but disabled: incompatible with "
+            f"grad_accum_steps={grad_accum_steps} (set it to 1 to use CUDA Graphs)"
+        )
+    use_cuda_graphs = (
+        use_cuda_graphs and use_compile and device.type == "cuda" and grad_accum_steps == 1
+    )
+    if use_compile:
+        torch._dynamo.config.cache_size_limit = 64
+        mode = "max-autotune" if use_cuda_graphs else "max-autotune-no-cudagraphs"
+        policy.compile(mode=mode, dynamic=False)
 
-    # Create pre/post processors for normalization
+    # Create pre/post processors for normalization (saved with checkpoints)
     preprocessor, postprocessor = make_pre_post_processors(
         cfg,
         dataset_stats=dataset_metadata.stats
     )
 
+    # Training skips image normalization in the preprocessor: images arrive as
+    # uint8 and are normalized on device by ImageNormalize instead
+    image_keys = tuple(cfg.image_features)
+    train_preprocessor, _ = make_pre_post_processors(
+        cfg,
+        dataset_stats={k: v for k, v in dataset_metadata.stats.items() if k not in image_keys},
+    )
+    image_dtype = torch.bfloat16 if bf16_weights else torch.float32
+    image_normalizers = {
+        key: ImageNormalize(
+            dataset_metadata.stats[key]["mean"], dataset_metadata.stats[key]["std"], image_dtype
+        ).to(device)
+        for key in image_keys
+    }
+
     logger.info(f"Policy created with {sum(p.numel() for p in policy.parameters()):,} parameters")
 
     # ==========================================================================
@@ -176,27 +350,66 @@ def main():
     logger.info(f"Delta timestamps: {delta_timestamps}")
 
     # Create dataset
-    dataset = LeRobotDataset(dataset_id, delta_timestamps=delta_timestamps)
+    dataset = LeRobotDataset(
+        dataset_id,
+        delta_timestamps=delta_timestamps,
+        image_transforms=to_uint8,
+        video_backend=video_backend,
+    )
     logger.info(f"Dataset loaded: {len(dataset)} samples")
+    logger.info(f"Video decode backend: {dataset.video_backend}")
 
     # Create dataloader
     dataloader = torch.utils.data.DataLoader(
         dataset,
         batch_size=batch_size,
         shuffle=True,
-        num_workers=4,
+        num_workers=num_workers,
         pin_memory=device.type != "cpu",
         drop_last=True,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
     )
+    logger.info(f"DataLoader: {num_workers} workers, prefetch_factor={prefetch_factor}")
 
     # ==========================================================================
     # Create Optimizer
     # ==========================================================================
 
     # Use the optimizer preset from ACT config
-    optimizer = cfg.get_optimizer_preset().build(policy.parameters())
+    if bf16_weights:
+        optim_params = [master_weights[name] for name, _ in policy.named_parameters()]
+        # Persistent fp32 gradient buffers: micro-batch gradients are summed here
+        # rather than in bf16 param.grad, and zeroed in place after each step
+        for master in optim_params:
+            master.grad = torch.zeros_like(master)
+        master_grads = [master.grad for master in optim_params]
+    else:
+        optim_params = list(policy.parameters())
+    optimizer = cfg.get_optimizer_preset().build(optim_params)
+
+    # The preset doesn't expose implementation kwargs, so rebuild AdamW with the
+    # same hyperparameters using the fused (CUDA) or multi-tensor kernels
+    if isinstance(optimizer, torch.optim.AdamW):
+        hparams = ("params", "lr", "betas", "eps", "weight_decay", "amsgrad")
+        param_groups = [{k: group[k] for k in hparams} for group in optimizer.param_groups]
+        if device.type == "cuda":
+            optimizer = torch.optim.AdamW(param_groups, fused=True)
+        else:
+            # MPS is not a foreach-supported device, so let torch choose there
+            optimizer = torch.optim.AdamW(
+                param_groups, foreach=True if device.type == "cpu" else None
+            )
     logger.info(f"Optimizer: {type(optimizer).__name__} with lr={cfg.optimizer_lr}")
 
+    # Mixed precision: bf16 needs no loss scaling, fp16 (CUDA or MPS) does to keep
+    # small gradients from underflowing
+    amp_dtype = get_amp_dtype(device)
+    scaler = torch.amp.GradScaler(
+        device.type,
+        enabled=use_amp and amp_dtype == torch.float16,
+    )
+
     # ==========================================================================
     # Training Loop
     # ==========================================================================
@@ -204,43 +417,96 @@ def main():
     logger.info("=" * 60)
     logger.info("Starting training...")
     logger.info(f"  Training steps: {training_steps:,}")
-    logger.info(f"  Batch size: {batch_size}")
+    logger.info(f"  Batch size: {batch_size} (x{grad_accum_steps} accumulation)")
     logger.info(f"  Chunk size: {chunk_size}")
     logger.info(f"  Device: {device}")
+    logger.info(f"  AMP: {f'enabled ({amp_dtype})' if use_amp else 'disabled'}")
+    logger.info(f"  bf16 weights: {'enabled' if bf16_weights else 'disabled'}")
+    logger.info(f"  Compile: {'enabled' if use_compile else 'disabled'}")
+    logger.info(f"  CUDA Graphs: {'enabled' if use_cuda_graphs else 'disabled'}")
     logger.info("=" * 60)
 
-    step = 0
-    epoch = 0
-    total_loss = 0.0
-    start_time = time.time()
+    # Resolve the parameter list once, outside the hot loop
+    params = list(policy.parameters())
 
-    while step < training_steps:
-        epoch += 1
-        for batch in dataloader:
-            # Preprocess batch (normalization, move to device)
-            batch = preprocessor(batch)
+    # Warm-compile on one batch so compilation isn't counted in steps/sec
+    if use_compile:
+        logger.info("Compiling policy (first step may take a while)...")
+        batch = train_preprocessor(next(iter(dataloader)))
+        batch = prepare_images(batch, image_normalizers)
+        with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=use_amp):
+            loss, _ = policy(batch)
+        scaler.scale(loss).backward()
+        policy.zero_grad(set_to_none=True)
 
-            # Forward pass
-            loss, loss_dict = policy.forward(batch)
+    # Background thread for checkpoint serialization
+    checkpoint_executor = ThreadPoolExecutor(max_workers=1)
+    checkpoint_futures: list[Future] = []
 
-            # Backward pass
-            optimizer.zero_grad()
-            loss.backward()
+    step = 0
+    micro_step = 0
+    running_loss = torch.zeros((), device=device)  # On-device to avoid per-step syncs
+    start_time = time.perf_counter()
+    last_log_time = start_time
 
-            # Gradient clipping for stability
-            torch.nn.utils.clip_grad_norm_(policy.parameters(), max_norm=10.0)
+    for epoch in itertools.count(1):
+        for batch in dataloader:
+            # Preprocess batch (move to device, normalize; uint8 images separately)
+            batch = train_preprocessor(batch)
+            batch = prepare_images(batch, image_normalizers)
 
-            optimizer.step()
+            # Forward pass (each micro-step is an optimizer step when CUDA Graphs
+            # are on, so graph outputs from the previous step can be reused)
+            if use_cuda_graphs:
+                torch.compiler.cudagraph_mark_step_begin()
+            with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=use_amp):
+                loss, loss_dict = policy(batch)
 
             # Accumulate loss for logging
-            total_loss += loss.item()
+            running_loss += loss.detach()
+
+            # Backward pass (gradients accumulate across micro-batches)
+            scaler.scale(loss / grad_accum_steps).backward()
+
+            # Accumulate bf16 gradients into the fp32 master gradients
+            if bf16_weights:
+                grad_pairs = [
+                    (master_grad, param.grad)
+                    for master_grad, param in zip(master_grads, params)
+                    if param.grad is not None
+                ]
+                torch._foreach_add_(
+                    [master_grad for master_grad, _ in grad_pairs],
+                    [grad for _, grad in grad_pairs],
+                )
+                policy.zero_grad(set_to_none=True)
+
+            micro_step += 1
+            if micro_step % grad_accum_steps != 0:
+                continue
+
+            # Gradient clipping for stability (on unscaled gradients). foreach=None
+            # uses the multi-tensor kernels on CUDA/CPU; forcing True raises on MPS
+            if scaler.is_enabled():
+                scaler.unscale_(optimizer)
+            torch.nn.utils.clip_grad_norm_(optim_params, max_norm=10.0, foreach=None)
+
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad(set_to_none=not bf16_weights)
+
+            # Copy updated master weights back into the bf16 model
+            if bf16_weights:
+                with torch.no_grad():
+                    torch._foreach_copy_(params, optim_params)
             step += 1
 
             # Logging
             if step % log_freq == 0:
-                avg_loss = total_loss / log_freq
-                elapsed = time.time() - start_time
-                steps_per_sec = step / elapsed
+                avg_loss = (running_loss / (log_freq * grad_accum_steps)).item()
+                now = time.perf_counter()
+                steps_per_sec = log_freq / (now - last_log_time)
+                last_log_time = now
                 eta = (training_steps - step) / steps_per_sec if steps_per_sec > 0 else 0
 
                 logger.info(
@@ -255,28 +521,35 @@ def main():
                     loss_str = " | ".join(f"{k}: {v:.4f}" for k, v in loss_dict.items())
                     logger.info(f"  Loss breakdown: {loss_str}")
 
-                total_loss = 0.0
+                running_loss.zero_()
 
             # Save checkpoint
             if step % save_freq == 0:
+                # Raise on any failed earlier write instead of training on without checkpoints
+                for future in checkpoint_futures:
+                    future.result()
                 checkpoint_dir = output_dir / f"checkpoint_{step:06d}"
-                checkpoint_dir.mkdir(parents=True, exist_ok=True)
-
-                policy.save_pretrained(checkpoint_dir)
-                preprocessor.save_pretrained(checkpoint_dir)
-                postprocessor.save_pretrained(checkpoint_dir)
-
-                logger.info(f"Checkpoint saved to {checkpoint_dir}")
+                future = save_checkpoint_async(
+                    checkpoint_executor,
+                    policy,
+                    preprocessor,
+                    postprocessor,
+                    checkpoint_dir,
+                    master_weights=master_weights,
+                )
+                checkpoint_futures.append(future)
 
             # Check if training is complete
             if step >= training_steps:
                 break
+        if step >= training_steps:
+            break
 
     # ==========================================================================
     # Save Final Model
     # ==========================================================================
 
-    total_time = time.time() - start_time
+    total_time = time.perf_counter() - start_time
     logger.info("=" * 60)
     logger.info(f"Training complete!")
     logger.info(f"  Total time: {total_time/60:.1f} minutes")
@@ -284,6 +557,19 @@ def main():
     logger.info(f"  Total epochs: {epoch}")
     logger.info("=" * 60)
 
+    # Wait for pending checkpoint writes before the final save
+    checkpoint_executor.shutdown(wait=True)
+    for future in checkpoint_futures:
+        future.result()
+
+    # Restore full-precision weights so the final model is saved in fp32
+    if bf16_weights:
+        policy.to(dtype=torch.float32)
+        policy.load_state_dict(master_weights, strict=False)
+
+    # safetensors rejects non-contiguous tensors, so undo channels_last first
+    policy.to(memory_format=torch.contiguous_format)
+
     # Save final model
     final_dir = output_dir / "final"
     final_dir.mkdir(parents=True, exist_ok=True)